@@ -1,66 +1,241 @@
 from __future__ import annotations
 
+import json
 import os
 import re
+import sys
+import threading
 import uuid
-from datetime import datetime, timezone
-from functools import wraps
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache, wraps
 
 import mysql.connector
+import redis
 from mysql.connector import errors as mysql_errors
 from mysql.connector import Error, errorcode
+from mysql.connector.constants import ClientFlag
+from mysql.connector.pooling import MySQLConnectionPool
 from flask import Flask, g, render_template, request, redirect, url_for, session, flash, abort
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask_compress import Compress
+from flask_session import Session
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from werkzeug.local import LocalProxy
+from werkzeug.security import check_password_hash
 
 from feature_flags import init_unleash, flag
 
 app = Flask(__name__)
 app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "dev-only-change-me")  # set env var in real use
 
-# Initialize Unleash (recommended once at startup)
-init_unleash()
+# Server-side sessions: the cookie only carries a session id, the cart lives in Redis
+redis_client = redis.Redis.from_url(os.getenv("REDIS_URL", "redis://redis:6379/0"))
+app.config.update(
+    SESSION_TYPE="redis",
+    SESSION_REDIS=redis_client,
+    SESSION_PERMANENT=False,  # browser-session cookie; Redis entries still expire after PERMANENT_SESSION_LIFETIME
+)
+Session(app)
+
+# gzip (zlib) / brotli (if installed) response compression
+Compress(app)
 
 # ----------------------------
 # Database helpers (MySQL)
 # ----------------------------
-def get_db():
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def db_config() -> dict:
+    return dict(
+        host=os.getenv("DB_HOST", "db"),  # IMPORTANT: default to Docker service name
+        port=int(os.getenv("DB_PORT", "3306")),
+        user=os.getenv("DB_USER", "app"),
+        password=os.getenv("DB_PASSWORD", "apppass"),
+        database=os.getenv("DB_NAME", "progressive_delivery"),
+        autocommit=False,  # we manage commits explicitly
+        time_zone="+00:00",  # DEFAULT/ON UPDATE CURRENT_TIMESTAMP columns are stored in UTC
+    )
+
+
+def get_pool() -> MySQLConnectionPool:
+    """
+    Lazily build one connection pool per process (i.e. per Gunicorn worker),
+    so connections are never shared across a fork.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = MySQLConnectionPool(
+                    pool_name="pd",
+                    # gunicorn.conf.py defaults this to the worker's thread count
+                    pool_size=int(os.getenv("DB_POOL_SIZE", "8")),
+                    pool_reset_session=False,  # close_db() rolls back instead of a full reset
+                    **db_config(),
+                )
+    return _pool
+
+
+def get_db(multi_statements: bool = False):
+    """
+    multi_statements=True gives the request a dedicated, non-pooled connection
+    with CLIENT_MULTI_STATEMENTS, as needed by exec_multi(). Only /pay uses it;
+    keeping the flag off the pool means a future SQL injection elsewhere can't
+    stack extra statements. It must be the request's first DB access.
+    """
     if "db" not in g:
-        g.db = mysql.connector.connect(
-            host=os.getenv("DB_HOST", "db"),  # IMPORTANT: default to Docker service name
-            port=int(os.getenv("DB_PORT", "3306")),
-            user=os.getenv("DB_USER", "app"),
-            password=os.getenv("DB_PASSWORD", "apppass"),
-            database=os.getenv("DB_NAME", "progressive_delivery"),
-            autocommit=False,  # we manage commits explicitly
-        )
+        if multi_statements:
+            g.db = mysql.connector.connect(client_flags=[ClientFlag.MULTI_STATEMENTS], **db_config())
+            g.db_multi_statements = True
+        else:
+            g.db = get_pool().get_connection()
+    elif multi_statements and not g.get("db_multi_statements"):
+        raise RuntimeError("get_db(multi_statements=True) must be the request's first DB access")
     return g.db
 
 
+def get_cursor(dictionary=True):
+    """
+    One cursor of each kind per request, reused by the query helpers.
+    Cursors are buffered so a query_one() never leaves unread rows behind.
+    """
+    key = "_cur_dict" if dictionary else "_cur_plain"
+    cur = g.get(key)
+    if cur is None:
+        cur = get_db().cursor(dictionary=dictionary, buffered=True)
+        setattr(g, key, cur)
+    return cur
+
+
 def query_all(sql, params=None):
-    cnx = get_db()
-    cur = cnx.cursor(dictionary=True)
+    cur = get_cursor()
     cur.execute(sql, params or ())
-    rows = cur.fetchall()
-    cur.close()
-    return rows
+    return cur.fetchall()
 
 
 def query_one(sql, params=None):
-    cnx = get_db()
-    cur = cnx.cursor(dictionary=True)
+    cur = get_cursor()
     cur.execute(sql, params or ())
-    row = cur.fetchone()
-    cur.close()
-    return row
+    return cur.fetchone()
 
 
-def exec_sql(sql, params=None):
+def _prepared_cache() -> dict:
+    """
+    {(sql, dictionary): cursor} for the current connection, kept on the
+    underlying pooled connection so it outlives the request.
+    """
     cnx = get_db()
-    cur = cnx.cursor()
+    raw = getattr(cnx, "_cnx", cnx)  # PooledMySQLConnection wraps the real connection
+    # The pool reconnect()s dead connections in place (e.g. after wait_timeout);
+    # statement handles from the old server session are then invalid.
+    conn_id = raw.connection_id
+    cached_id, cache = getattr(raw, "_pd_prepared", (None, None))
+    if cache is None or cached_id != conn_id:
+        cache = {}
+        raw._pd_prepared = (conn_id, cache)
+    return cache
+
+
+def _prepared_cursor(sql, dictionary=True):
+    """
+    Server-side prepared cursor for `sql`, one per statement text (and row type).
+    Kept on the underlying pooled connection (not on g) so the prepared
+    statement survives across requests that reuse the same connection.
+
+    Returns (cursor, sql): execute the returned `sql` object. The cursor only
+    skips re-preparing when it gets the *same* string object it last ran
+    (`operation is not self._executed`), and f-string SQL is a new object on
+    every call, so the text is interned here.
+    """
+    cache = _prepared_cache()
+    sql = sys.intern(sql)
+    key = (sql, dictionary)
+    cur = cache.get(key)
+    if cur is None:
+        cur = cache[key] = get_db().cursor(prepared=True, dictionary=dictionary)
+    return cur, sql
+
+
+def _execute_prepared(sql, params, dictionary):
+    cur, sql = _prepared_cursor(sql, dictionary)
+    try:
+        cur.execute(sql, params or ())
+        return cur.fetchall()
+    except Error:
+        # Don't keep a cursor whose statement (or session) may be gone, and
+        # release its server-side handle (max_prepared_stmt_count is global)
+        try:
+            cur.close()
+        except Exception:
+            pass
+        _prepared_cache().pop((sql, dictionary), None)
+        raise
+
+
+def query_all_prepared(sql, params=None):
+    # Only for a bounded set of SQL texts: every distinct text keeps a cursor open
+    return _execute_prepared(sql, params, dictionary=True)
+
+
+def query_one_prepared(sql, params=None):
+    rows = query_all_prepared(sql, params)  # always drain: prepared cursors are unbuffered
+    return rows[0] if rows else None
+
+
+@lru_cache(maxsize=None)
+def row_type(fields: tuple[str, ...]):
+    return namedtuple("Row", fields)
+
+
+def query_all_t(sql, params, fields: tuple[str, ...]):
+    """
+    Tuple-cursor variant of query_all_prepared() for hot multi-row reads:
+    rows come back as namedtuples instead of one dict per row.
+    `fields` must match the SELECT list order.
+    """
+    make = row_type(fields)._make
+    return [make(r) for r in _execute_prepared(sql, params, dictionary=False)]
+
+
+# Joins against a JSON array of ids (bound as one parameter), so the SQL text is
+# the same for every cart size. Reused as prepared statements per pooled
+# connection (via _prepared_cursor()'s interning): load_cart_items() and
+# load_active_cart_items(). /pay runs its SELECT ... FOR UPDATE and write batch
+# on a dedicated, throwaway connection over the text protocol, so nothing
+# there is prepared.
+# `j.pos` preserves the order ids were given in.
+IDS_JSON_TABLE = "JSON_TABLE(%s, '$[*]' COLUMNS(pos FOR ORDINALITY, id INT PATH '$')) j"
+
+
+def exec_sql(sql, params=None):
+    cur = get_cursor(dictionary=False)
     cur.execute(sql, params or ())
-    last_id = cur.lastrowid
-    cur.close()
-    return last_id
+    return cur.lastrowid
+
+
+def exec_multi(sql, params=None):
+    """
+    Run several ;-separated statements in one round-trip, on a connection from
+    get_db(multi_statements=True).
+    Returns the rows of the last statement that produced a result set.
+    """
+    if not g.get("db_multi_statements"):
+        raise RuntimeError("exec_multi() needs get_db(multi_statements=True)")
+    cur = get_db().cursor()
+    try:
+        cur.execute(sql, params or ())
+        rows = []
+        while True:
+            if cur.with_rows:
+                rows = cur.fetchall()
+            if not cur.nextset():
+                break
+        return rows
+    finally:
+        cur.close()
 
 
 def create_index_if_missing(cur, ddl: str) -> None:
@@ -76,18 +251,63 @@ def create_index_if_missing(cur, ddl: str) -> None:
             raise
 
 
+def migrate_iso_timestamp(cur, table: str, column: str, ddl_type: str) -> None:
+    """
+    Convert a VARCHAR column holding the ISO-8601 strings the app used to write
+    ("2024-01-31T12:00:00+00:00") to DATETIME. No-op once converted.
+    """
+    cur.execute(
+        """
+        SELECT DATA_TYPE FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        """,
+        (table, column),
+    )
+    rows = cur.fetchall()
+    data_type = rows[0][0] if rows else ""
+    if isinstance(data_type, (bytes, bytearray)):
+        data_type = data_type.decode()
+    if data_type.lower() != "varchar":
+        return
+    cur.execute(f"UPDATE {table} SET {column} = REPLACE(LEFT({column}, 19), 'T', ' ')")
+    cur.execute(f"ALTER TABLE {table} MODIFY {column} {ddl_type}")
+
+
 @app.teardown_appcontext
 def close_db(_exc):
+    for key in ("_cur_dict", "_cur_plain"):
+        cur = g.pop(key, None)
+        if cur is not None:
+            try:
+                cur.close()
+            except Exception:
+                pass
+
     db = g.pop("db", None)
     if db is not None:
         try:
-            db.close()
+            # Don't hand an open transaction (and its stale snapshot) to the next request.
+            if db.in_transaction:
+                db.rollback()
+        except Exception:
+            pass
+        try:
+            db.close()  # pooled: returns it to the pool; multi-statement (/pay): disconnects
         except Exception:
             pass
 
 
 def init_db():
-    cnx = get_db()
+    """
+    Create tables and indexes. Run once per deployment, not per request:
+    Gunicorn calls it from the master's on_starting hook (gunicorn.conf.py),
+    `python app.py` calls it before serving. For Kubernetes, prefer a one-time
+    migration Job running `python -c "import app; app.init_db()"`.
+
+    Uses its own short-lived connection so the process that runs it (e.g. the
+    Gunicorn master) never builds a pool that forked workers would inherit.
+    """
+    cnx = mysql.connector.connect(**db_config())
     cur = cnx.cursor()
 
     cur.execute(
@@ -97,7 +317,7 @@ def init_db():
             name VARCHAR(255) NOT NULL,
             email VARCHAR(255) NOT NULL UNIQUE,
             password_hash VARCHAR(255) NOT NULL,
-            created_at VARCHAR(32) NOT NULL
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
         ) ENGINE=InnoDB;
         """
     )
@@ -117,8 +337,8 @@ def init_db():
             location VARCHAR(255) NOT NULL,
             description TEXT NOT NULL,
             status VARCHAR(16) NOT NULL DEFAULT 'ACTIVE',  -- ACTIVE or SOLD
-            created_at VARCHAR(32) NOT NULL,
-            updated_at VARCHAR(32) NOT NULL,
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
             CONSTRAINT fk_listings_user FOREIGN KEY (user_id)
                 REFERENCES users(id) ON DELETE CASCADE
         ) ENGINE=InnoDB;
@@ -129,7 +349,7 @@ def init_db():
         """
         CREATE TABLE IF NOT EXISTS purchases (
             id INT PRIMARY KEY AUTO_INCREMENT,
-            created_at VARCHAR(32) NOT NULL,
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
             total_amount_cents INT NOT NULL,
             payment_ref VARCHAR(64) NOT NULL
         ) ENGINE=InnoDB;
@@ -151,26 +371,85 @@ def init_db():
         """
     )
 
+    # Tables created before the switch to DATETIME stored ISO-8601 strings
+    migrate_iso_timestamp(cur, "users", "created_at", "DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP")
+    migrate_iso_timestamp(cur, "listings", "created_at", "DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP")
+    migrate_iso_timestamp(
+        cur, "listings", "updated_at", "DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
+    )
+    migrate_iso_timestamp(cur, "purchases", "created_at", "DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP")
+
     # Indexes (safe for repeated runs)
     create_index_if_missing(cur, "CREATE INDEX idx_listings_status_created ON listings(status, created_at)")
+    # Browse (/): equality on status, newest-first scan with LIMIT, price/year filtered in-index
+    create_index_if_missing(
+        cur,
+        "CREATE INDEX idx_listings_active_browse ON listings(status, created_at DESC, price_cents, `year`)",
+    )
     create_index_if_missing(cur, "CREATE INDEX idx_listings_user ON listings(user_id, created_at)")
     create_index_if_missing(cur, "CREATE INDEX idx_purchase_items_purchase ON purchase_items(purchase_id)")
     create_index_if_missing(cur, "CREATE INDEX idx_purchase_items_listing ON purchase_items(listing_id)")
+    create_index_if_missing(
+        cur,
+        "CREATE FULLTEXT INDEX ft_listings_text ON listings(title, description, model, make, location)",
+    )
 
     cnx.commit()
     cur.close()
+    cnx.close()
 
 
-_db_inited = False
+# ----------------------------
+# Read-through cache (Redis)
+# ----------------------------
+INDEX_CACHE_TTL = 30
+LISTING_CACHE_TTL = 300
+INDEX_VERSION_KEY = "idx:ver"
+# Bump when the cached row format changes, so old and new pods sharing Redis
+# never read each other's entries. v2: rows are JSON arrays in INDEX_FIELDS order.
+INDEX_CACHE_FORMAT = "v2"
 
 
-@app.before_request
-def _ensure_db():
-    # NOTE: For Kubernetes, prefer a one-time migration Job.
-    global _db_inited
-    if not _db_inited:
-        init_db()
-        _db_inited = True
+def cached(key: str, ttl: int, fn):
+    """
+    Return the JSON-cached value for `key`, or run fn() and cache its result.
+    Fails open: if Redis is unavailable we just hit the database.
+    None is never cached so a 404 can't outlive the row being created.
+    """
+    try:
+        hit = redis_client.get(key)
+    except redis.RedisError:
+        return fn()
+    if hit is not None:
+        return json.loads(hit)
+
+    value = fn()
+    if value is not None:
+        try:
+            redis_client.setex(key, ttl, json.dumps(value, default=str))
+        except redis.RedisError:
+            pass
+    return value
+
+
+def index_cache_version() -> int:
+    # Bumping this counter orphans every idx:* key at once (they expire via TTL)
+    try:
+        return int(redis_client.get(INDEX_VERSION_KEY) or 0)
+    except redis.RedisError:
+        return 0
+
+
+def invalidate_listings(*listing_ids: int) -> None:
+    """Call after committing a write that changes what / or /listing/<id> shows."""
+    try:
+        pipe = redis_client.pipeline()
+        pipe.incr(INDEX_VERSION_KEY)
+        for listing_id in listing_ids:
+            pipe.delete(f"lst:{listing_id}")
+        pipe.execute()
+    except redis.RedisError:
+        pass
 
 
 # ----------------------------
@@ -200,25 +479,89 @@ def login_required(view):
 
 
 def current_user():
-    uid = session.get("user_id")
-    if not uid:
-        return None
-    return query_one("SELECT id, name, email FROM users WHERE id = %s", (int(uid),))
+    # Cached per request: routes and the base template both ask for it
+    if "current_user" not in g:
+        uid = session.get("user_id")
+        g.current_user = (
+            query_one_prepared("SELECT id, name, email FROM users WHERE id = %s", (int(uid),)) if uid else None
+        )
+    return g.current_user
 
 
 @app.context_processor
 def inject_user():
-    return {"current_user": current_user()}
+    # Lazy: the SELECT only runs if a template actually touches current_user
+    return {"current_user": LocalProxy(current_user)}
+
+
+# ----------------------------
+# HTTP caching
+# ----------------------------
+PUBLIC_CACHE_ENDPOINTS = {"index", "listing_detail"}
+PUBLIC_CACHE_MAX_AGE = 30
+
+
+@app.before_request
+def mark_shared_cache_page():
+    """
+    Browse pages requested without a session cookie can be served from a
+    shared cache. feature_flags checks g.shared_cache_page and skips minting a
+    session id for them, so the response stays cookie-free.
+    """
+    g.shared_cache_page = (
+        request.method == "GET"
+        and request.endpoint in PUBLIC_CACHE_ENDPOINTS
+        and app.config["SESSION_COOKIE_NAME"] not in request.cookies
+    )
+
+
+@app.after_request
+def public_cache_headers(response):
+    """
+    Let a CDN / nginx microcache (s-maxage) serve cookie-less browse pages for
+    a short while. Browsers must revalidate (max-age=0): the session cookie
+    keeps its value across login, so a browser-cached page could otherwise
+    show stale logged-out content right after logging in.
+    """
+    if (
+        g.get("shared_cache_page")
+        and response.status_code == 200
+        and not session.modified  # e.g. a flash(); the cookie is written after this hook
+    ):
+        response.cache_control.public = True
+        response.cache_control.max_age = 0
+        response.cache_control.s_maxage = PUBLIC_CACHE_MAX_AGE
+        response.vary.add("Cookie")
+    return response
 
 
 # ----------------------------
 # Validation helpers
 # ----------------------------
 EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+PRICE_RE = re.compile(r"\d+(\.\d{1,2})?", re.ASCII)
+
 
+# argon2id (argon2-cffi C implementation); parameters per OWASP's minimum recommendation
+_password_hasher = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)  # type defaults to argon2id
 
-def utc_now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+def hash_password(password: str) -> str:
+    return _password_hasher.hash(password)
+
+
+def verify_password(stored_hash: str, password: str) -> tuple[bool, bool]:
+    """
+    Returns (ok, needs_rehash). Hashes created before the argon2 switch are
+    werkzeug's "method:salt$hash" format and are verified with werkzeug.
+    """
+    if not stored_hash.startswith("$argon2"):
+        return check_password_hash(stored_hash, password), True
+    try:
+        _password_hasher.verify(stored_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False, False
+    return True, _password_hasher.check_needs_rehash(stored_hash)
 
 
 def parse_int(value: str, field: str, min_v: int | None = None, max_v: int | None = None) -> int:
@@ -235,14 +578,14 @@ def parse_int(value: str, field: str, min_v: int | None = None, max_v: int | Non
 
 def parse_price_to_cents(value: str) -> int:
     v = value.strip().replace(",", "")
-    if not re.fullmatch(r"\d+(\.\d{1,2})?", v):
-        raise ValueError("Price must be a number like 12000 or 12000.50.")
-    if "." in v:
+    if v.isascii() and v.isdigit():
+        # Common case: whole-dollar amount, no regex needed
+        price_cents = int(v) * 100
+    elif PRICE_RE.fullmatch(v):
         dollars, cents = v.split(".")
-        cents = (cents + "0")[:2]
+        price_cents = int(dollars) * 100 + int((cents + "0")[:2])
     else:
-        dollars, cents = v, "00"
-    price_cents = int(dollars) * 100 + int(cents)
+        raise ValueError("Price must be a number like 12000 or 12000.50.")
     if price_cents <= 0:
         raise ValueError("Price must be greater than 0.")
     if price_cents > 500_000_000 * 100:
@@ -251,7 +594,10 @@ def parse_price_to_cents(value: str) -> int:
 
 
 def money_display(price_cents: int, currency: str = "USD") -> str:
-    return f"{currency} {price_cents/100:,.2f}"
+    # Integer-only: no float conversion, no .2f formatting
+    sign = "-" if price_cents < 0 else ""
+    dollars, cents = divmod(abs(price_cents), 100)
+    return f"{currency} {sign}{dollars:,}.{cents:02d}"
 
 
 @app.template_filter("money")
@@ -262,6 +608,13 @@ def _money_filter(price_cents):
 # ----------------------------
 # Routes: Public
 # ----------------------------
+# Must match the SELECT list in index()
+INDEX_FIELDS = (
+    "id", "user_id", "title", "make", "model", "year", "mileage",
+    "price_cents", "currency", "location", "status", "seller_name",
+)
+
+
 @app.get("/")
 def index():
     q = (request.args.get("q") or "").strip()
@@ -273,9 +626,9 @@ def index():
     params: list = []
 
     if q:
-        where.append("(l.title LIKE %s OR l.description LIKE %s OR l.model LIKE %s OR l.make LIKE %s OR l.location LIKE %s)")
-        like = f"%{q}%"
-        params += [like, like, like, like, like]
+        # Backed by ft_listings_text; a leading-wildcard LIKE can't use any index
+        where.append("MATCH(l.title, l.description, l.model, l.make, l.location) AGAINST (%s IN NATURAL LANGUAGE MODE)")
+        params.append(q)
 
     if make:
         where.append("l.make LIKE %s")
@@ -298,27 +651,42 @@ def index():
             flash(str(e), "warning")
 
     sql = f"""
-        SELECT l.*, u.name AS seller_name
+        SELECT l.id, l.user_id, l.title, l.make, l.model, l.`year`, l.mileage,
+               l.price_cents, l.currency, l.location, l.status, u.name AS seller_name
         FROM listings l
         JOIN users u ON u.id = l.user_id
         WHERE {' AND '.join(where)}
         ORDER BY l.created_at DESC
         LIMIT 50;
     """
-    listings = query_all(sql, tuple(params))
+    # At most one SQL text per filter combination, so prepared statements stay bounded
+    # Cached as JSON arrays; rebuild the namedtuples on the way out
+    row = row_type(INDEX_FIELDS)._make
+    listings = [
+        row(r)
+        for r in cached(
+            f"idx:{INDEX_CACHE_FORMAT}:{index_cache_version()}:{q}|{make}|{min_year}|{max_price}",
+            INDEX_CACHE_TTL,
+            lambda: query_all_t(sql, tuple(params), INDEX_FIELDS),
+        )
+    ]
     return render_template("index.html", listings=listings, q=q, make=make, min_year=min_year, max_price=max_price)
 
 
 @app.get("/listing/<int:listing_id>")
 def listing_detail(listing_id: int):
-    listing = query_one(
-        """
-        SELECT l.*, u.name AS seller_name, u.email AS seller_email
-        FROM listings l
-        JOIN users u ON u.id = l.user_id
-        WHERE l.id = %s
-        """,
-        (listing_id,),
+    listing = cached(
+        f"lst:{listing_id}",
+        LISTING_CACHE_TTL,
+        lambda: query_one_prepared(
+            """
+            SELECT l.*, u.name AS seller_name, u.email AS seller_email
+            FROM listings l
+            JOIN users u ON u.id = l.user_id
+            WHERE l.id = %s
+            """,
+            (listing_id,),
+        ),
     )
     if not listing:
         abort(404)
@@ -352,8 +720,8 @@ def register_post():
     cnx = get_db()
     try:
         exec_sql(
-            "INSERT INTO users (name, email, password_hash, created_at) VALUES (%s, %s, %s, %s)",
-            (name, email, generate_password_hash(password), utc_now_iso()),
+            "INSERT INTO users (name, email, password_hash) VALUES (%s, %s, %s)",
+            (name, email, hash_password(password)),
         )
         cnx.commit()
     except mysql_errors.IntegrityError:
@@ -377,10 +745,22 @@ def login_post():
     next_url = (request.form.get("next") or "").strip() or url_for("index")
 
     user = query_one("SELECT * FROM users WHERE email = %s", (email,))
-    if not user or not check_password_hash(user["password_hash"], password):
+    ok, needs_rehash = verify_password(user["password_hash"], password) if user else (False, False)
+    if not ok:
         flash("Invalid email or password.", "danger")
         return redirect(url_for("login", next=next_url))
 
+    if needs_rehash:
+        # Migrate legacy werkzeug (or outdated argon2) hashes on successful login
+        exec_sql("UPDATE users SET password_hash = %s WHERE id = %s", (hash_password(password), int(user["id"])))
+        get_db().commit()
+
+    # Server-side sessions keep their id across clear(); issue a new one so a
+    # pre-login (possibly attacker-planted) session id can't be reused.
+    # regenerate() is a no-op on an empty session -- which is what a planted id
+    # with nothing stored behind it loads as -- so give it content first.
+    session["user_id"] = int(user["id"])
+    app.session_interface.regenerate(session)
     session.clear()
     session["user_id"] = int(user["id"])
     flash(f"Welcome back, {user['name']}!", "success")
@@ -454,18 +834,18 @@ def new_listing_post():
             flash(e, "danger")
         return redirect(url_for("new_listing"))
 
-    now = utc_now_iso()
     cnx = get_db()
     exec_sql(
         """
         INSERT INTO listings
-          (user_id, title, make, model, `year`, mileage, price_cents, currency, location, description, status, created_at, updated_at)
+          (user_id, title, make, model, `year`, mileage, price_cents, currency, location, description, status)
         VALUES
-          (%s, %s, %s, %s, %s, %s, %s, 'USD', %s, %s, 'ACTIVE', %s, %s)
+          (%s, %s, %s, %s, %s, %s, %s, 'USD', %s, %s, 'ACTIVE')
         """,
-        (int(user["id"]), title, make, model, year, mileage, price_cents, location, description, now, now),
+        (int(user["id"]), title, make, model, year, mileage, price_cents, location, description),
     )
     cnx.commit()
+    invalidate_listings()
 
     flash("Your car has been posted and is now visible to buyers.", "success")
     return redirect(url_for("my_listings"))
@@ -535,12 +915,13 @@ def edit_listing_post(listing_id: int):
     exec_sql(
         """
         UPDATE listings
-        SET title = %s, price_cents = %s, location = %s, description = %s, updated_at = %s
+        SET title = %s, price_cents = %s, location = %s, description = %s
         WHERE id = %s AND user_id = %s
         """,
-        (title, price_cents, location, description, utc_now_iso(), listing_id, int(listing["user_id"])),
+        (title, price_cents, location, description, listing_id, int(listing["user_id"])),
     )
     cnx.commit()
+    invalidate_listings(listing_id)
     flash("Listing updated.", "success")
     return redirect(url_for("my_listings"))
 
@@ -555,10 +936,11 @@ def mark_sold(listing_id: int):
 
     cnx = get_db()
     exec_sql(
-        "UPDATE listings SET status = 'SOLD', updated_at = %s WHERE id = %s AND user_id = %s",
-        (utc_now_iso(), listing_id, int(listing["user_id"])),
+        "UPDATE listings SET status = 'SOLD' WHERE id = %s AND user_id = %s",
+        (listing_id, int(listing["user_id"])),
     )
     cnx.commit()
+    invalidate_listings(listing_id)
     flash("Listing marked as SOLD.", "success")
     return redirect(url_for("my_listings"))
 
@@ -571,6 +953,7 @@ def delete_listing(listing_id: int):
     cnx = get_db()
     exec_sql("DELETE FROM listings WHERE id = %s AND user_id = %s", (listing_id, int(listing["user_id"])))
     cnx.commit()
+    invalidate_listings(listing_id)
 
     flash("Listing deleted.", "success")
     return redirect(url_for("my_listings"))
@@ -597,13 +980,36 @@ def cart_clear():
 def load_cart_items(ids: list[int]):
     if not ids:
         return []
-    placeholders = ",".join(["%s"] * len(ids))
-    rows = query_all(
-        f"SELECT id, title, price_cents, status FROM listings WHERE id IN ({placeholders})",
-        tuple(ids),
+    return query_all_t(
+        f"""
+        SELECT l.id, l.title, l.price_cents, l.status
+        FROM {IDS_JSON_TABLE}
+        JOIN listings l ON l.id = j.id
+        ORDER BY j.pos
+        """,
+        (json.dumps(ids),),
+        ("id", "title", "price_cents", "status"),
+    )
+
+
+def load_active_cart_items(ids: list[int]):
+    """
+    Like load_cart_items(), but only ACTIVE rows, each carrying the SQL-computed
+    cart total as `total_cents` (so callers don't need a second pass).
+    """
+    if not ids:
+        return []
+    return query_all_t(
+        f"""
+        SELECT l.id, l.title, l.price_cents, SUM(l.price_cents) OVER () AS total_cents
+        FROM {IDS_JSON_TABLE}
+        JOIN listings l ON l.id = j.id
+        WHERE l.status = 'ACTIVE'
+        ORDER BY j.pos
+        """,
+        (json.dumps(ids),),
+        ("id", "title", "price_cents", "total_cents"),
     )
-    by_id = {int(r["id"]): r for r in rows}
-    return [by_id[i] for i in ids if i in by_id]
 
 
 def dummy_charge(card_number: str, exp_mm: str, exp_yy: str, cvc: str) -> str:
@@ -641,7 +1047,7 @@ def view_cart():
 
     ids = cart_ids()
     items = load_cart_items(ids)
-    total_cents = sum(int(i["price_cents"]) for i in items if i["status"] == "ACTIVE")
+    total_cents = sum(i.price_cents for i in items if i.status == "ACTIVE")
     return render_template(
         "cart.html",
         items=items,
@@ -656,15 +1062,15 @@ def checkout():
         abort(404)
 
     ids = cart_ids()
-    items = load_cart_items(ids)
-    if not items:
+    if not ids:
         flash("Cart is empty.")
         return redirect(url_for("view_cart"))
-    if any(i["status"] != "ACTIVE" for i in items):
+    items = load_active_cart_items(ids)
+    if len(items) != len(ids):
         flash("One or more listings were sold. Please refresh cart.")
         return redirect(url_for("view_cart"))
 
-    total_cents = sum(int(i["price_cents"]) for i in items)
+    total_cents = int(items[0].total_cents)
     return render_template("checkout.html", items=items, total_cents=total_cents)
 
 
@@ -679,20 +1085,26 @@ def pay():
     cvc = request.form.get("cvc", "")
 
     ids = cart_ids()
-    items = load_cart_items(ids)
-    if not items:
+    if not ids:
         flash("Cart is empty.")
         return redirect(url_for("view_cart"))
 
-    cnx = get_db()
+    cnx = get_db(multi_statements=True)  # for the exec_multi() write batch below
     try:
         cnx.start_transaction()
 
-        # Lock the rows to prevent double-sell
-        placeholders = ",".join(["%s"] * len(ids))
+        # Lock the rows to prevent double-sell; this is also the only read of the cart rows
+        # Text protocol: this connection is discarded after the request, so a
+        # prepared statement could never be reused.
+        ids_json = json.dumps(ids)
         locked = query_all(
-            f"SELECT id, status, price_cents FROM listings WHERE id IN ({placeholders}) FOR UPDATE",
-            tuple(ids),
+            f"""
+            SELECT l.id, l.status, l.price_cents
+            FROM {IDS_JSON_TABLE}
+            JOIN listings l ON l.id = j.id
+            FOR UPDATE OF l
+            """,
+            (ids_json,),
         )
         by_id = {int(r["id"]): r for r in locked}
 
@@ -703,25 +1115,25 @@ def pay():
 
         payment_ref = dummy_charge(card_number, exp_mm, exp_yy, cvc)
         total_cents = sum(int(by_id[i]["price_cents"]) for i in ids)
-        now = utc_now_iso()
 
-        purchase_id = exec_sql(
-            "INSERT INTO purchases (created_at, total_amount_cents, payment_ref) VALUES (%s, %s, %s)",
-            (now, total_cents, payment_ref),
-        )
-
-        for i in ids:
-            exec_sql(
-                "INSERT INTO purchase_items (purchase_id, listing_id, price_cents) VALUES (%s, %s, %s)",
-                (purchase_id, i, int(by_id[i]["price_cents"])),
-            )
-
-        exec_sql(
-            f"UPDATE listings SET status = 'SOLD', updated_at = %s WHERE id IN ({placeholders})",
-            tuple([now] + ids),
+        # All writes in one round-trip to keep the row-lock window short
+        ((purchase_id,),) = exec_multi(
+            f"""
+            INSERT INTO purchases (total_amount_cents, payment_ref) VALUES (%s, %s);
+            SET @purchase_id = LAST_INSERT_ID();
+            INSERT INTO purchase_items (purchase_id, listing_id, price_cents)
+                SELECT @purchase_id, l.id, l.price_cents
+                FROM {IDS_JSON_TABLE}
+                JOIN listings l ON l.id = j.id
+                ORDER BY j.pos;
+            UPDATE {IDS_JSON_TABLE} JOIN listings l ON l.id = j.id SET l.status = 'SOLD';
+            SELECT @purchase_id
+            """,
+            (total_cents, payment_ref, ids_json, ids_json),
         )
 
         cnx.commit()
+        invalidate_listings(*ids)
         cart_clear()
         return redirect(url_for("purchase_success", purchase_id=purchase_id))
 
@@ -756,4 +1168,7 @@ def purchase_success(purchase_id: int):
 # Run
 # ----------------------------
 if __name__ == "__main__":
+    init_db()
+    # Under Gunicorn this happens per worker in gunicorn.conf.py's post_fork hook
+    init_unleash()
     app.run(host="0.0.0.0", port=5000, debug=False)
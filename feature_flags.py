@@ -1,9 +1,12 @@
+import inspect
 import os
+import secrets
 
 from UnleashClient import UnleashClient
-from flask import request, session, has_request_context
+from flask import g, request, session, has_request_context
 
 _unleash = None
+_is_enabled = None
 
 
 def _normalize_unleash_url(url: str) -> str:
@@ -20,6 +23,37 @@ def _normalize_unleash_url(url: str) -> str:
     return u
 
 
+def _auth_header() -> str:
+    token = (os.getenv("UNLEASH_API_TOKEN") or "").strip()
+    if not token:
+        return ""
+    prefix = (os.getenv("UNLEASH_AUTH_PREFIX") or "").strip()
+    return f"{prefix} {token}".strip() if prefix else token
+
+
+# Computed once at import; the env doesn't change for the life of the process
+_AUTH_HEADER = _auth_header()
+
+
+def _make_is_enabled(client):
+    """
+    Version-tolerant Unleash 'is_enabled' call, resolved once from the signature:
+    - some clients use default_value=
+    - some use default=
+    - some support no default parameter
+    """
+    try:
+        params = inspect.signature(client.is_enabled).parameters
+    except (TypeError, ValueError):
+        params = {}
+
+    if "default_value" in params:
+        return lambda name, ctx, default: client.is_enabled(name, context=ctx, default_value=default)
+    if "default" in params:
+        return lambda name, ctx, default: client.is_enabled(name, context=ctx, default=default)
+    return lambda name, ctx, default: client.is_enabled(name, context=ctx)
+
+
 def init_unleash():
     """
     Call once at app startup (or it will lazy-init on first flag() call).
@@ -33,7 +67,7 @@ def init_unleash():
     Optional:
       UNLEASH_AUTH_PREFIX (e.g., 'Bearer'; if set, header becomes 'Bearer <token>')
     """
-    global _unleash
+    global _unleash, _is_enabled
     if _unleash is not None:
         return _unleash
 
@@ -43,11 +77,7 @@ def init_unleash():
 
     url = _normalize_unleash_url(raw_url)
 
-    headers = {}
-    token = (os.getenv("UNLEASH_API_TOKEN") or "").strip()
-    if token:
-        prefix = (os.getenv("UNLEASH_AUTH_PREFIX") or "").strip()
-        headers["Authorization"] = f"{prefix} {token}".strip() if prefix else token
+    headers = {"Authorization": _AUTH_HEADER} if _AUTH_HEADER else {}
 
     _unleash = UnleashClient(
         url=url,
@@ -55,6 +85,7 @@ def init_unleash():
         instance_id=os.getenv("UNLEASH_INSTANCE_ID", "car-marketplace-1"),
         custom_headers=headers or None,
     )
+    _is_enabled = _make_is_enabled(_unleash)
 
     # Don’t let startup kill the app if Unleash is misconfigured/unreachable.
     # Flags will fall back to defaults in flag().
@@ -71,41 +102,54 @@ def _context():
     if not has_request_context():
         return {}
 
-    # Ensure a stable session id exists
-    if "_sid" not in session:
-        session["_sid"] = os.urandom(8).hex()
-
-    return {
+    # Built once per request; flag() is called several times per page
+    ctx = g.get("_unleash_ctx")
+    if ctx is not None:
+        return ctx
+
+    # Ensure a stable session id exists, except on pages meant for a shared
+    # cache (see app.mark_shared_cache_page): those must not set a cookie.
+    sid = session.get("_sid")
+    if sid is None:
+        if g.get("shared_cache_page"):
+            sid = "anon-session"
+        else:
+            sid = session["_sid"] = secrets.token_hex(8)
+
+    ctx = g._unleash_ctx = {
         "userId": str(session.get("user_id", "anonymous")),
-        "sessionId": str(session.get("_sid", "anon-session")),
-        "remoteAddress": request.headers.get("X-Forwarded-For", request.remote_addr),
+        "sessionId": str(sid),
+        # Read the WSGI environ directly; skips EnvironHeaders' case-insensitive lookup
+        "remoteAddress": request.environ.get("HTTP_X_FORWARDED_FOR") or request.remote_addr,
     }
+    return ctx
 
 
 def flag(name: str, default: bool = False) -> bool:
     """
-    Version-tolerant Unleash 'is_enabled' call:
-    - some clients use default_value=
-    - some use default=
-    - some support no default parameter
-    Also fails open to provided default if Unleash is unreachable/unauthorized (403).
+    Evaluate a feature flag via the is_enabled call resolved in init_unleash().
+    Fails open to provided default if Unleash is unreachable/unauthorized (403).
+    Results are memoized for the rest of the current request.
     """
+    if not has_request_context():
+        return _evaluate(name, default)
+
+    cache = g.get("_flags")
+    if cache is None:
+        cache = g._flags = {}
+    key = (name, default)
+    if key not in cache:
+        cache[key] = _evaluate(name, default)
+    return cache[key]
+
+
+def _evaluate(name: str, default: bool) -> bool:
     try:
-        client = init_unleash()
+        init_unleash()
     except Exception:
         return bool(default)
 
-    ctx = _context()
-
     try:
-        return bool(client.is_enabled(name, context=ctx, default_value=default))
-    except TypeError:
-        try:
-            return bool(client.is_enabled(name, context=ctx, default=default))
-        except TypeError:
-            try:
-                return bool(client.is_enabled(name, context=ctx))
-            except Exception:
-                return bool(default)
+        return bool(_is_enabled(name, _context(), default))
     except Exception:
         return bool(default)
@@ -0,0 +1,64 @@
+import os
+
+from mysql.connector.pooling import CNX_POOL_MAXSIZE
+
+# Threaded workers: each worker handles up to `threads` requests concurrently,
+# so a slow MySQL/Unleash call doesn't block everyone else.
+#
+# Every worker opens its own MySQL pool of DB_POOL_SIZE connections (all at
+# once, when the pool is built). workers * DB_POOL_SIZE is capped at
+# DB_CONNECTION_BUDGET -- default 140, i.e. MySQL's default max_connections
+# (151) minus headroom for migrations/admin and for /pay, which opens one
+# short-lived dedicated connection per checkout.
+
+def _cpu_count() -> int:
+    # Unlike multiprocessing.cpu_count(), honours container limits:
+    # CPU pinning (affinity) and a cgroup v2 quota (e.g. `docker run --cpus`).
+    try:
+        n = len(os.sched_getaffinity(0))
+    except AttributeError:
+        n = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            n = min(n, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return n
+
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+
+# One connection per thread is all a worker can use at a time
+_db_pool_size = int(os.environ.setdefault("DB_POOL_SIZE", str(threads)))
+if _db_pool_size > CNX_POOL_MAXSIZE:
+    raise ValueError(
+        f"DB_POOL_SIZE={_db_pool_size} (defaults to GUNICORN_THREADS) exceeds "
+        f"mysql-connector's maximum pool size of {CNX_POOL_MAXSIZE}"
+    )
+
+# gthread workers get their concurrency from threads, so ~1 worker per CPU;
+# never more than the connection budget allows.
+_db_connection_budget = int(os.getenv("DB_CONNECTION_BUDGET", "140"))
+workers = min(
+    int(os.getenv("GUNICORN_WORKERS", _cpu_count())),
+    max(1, _db_connection_budget // _db_pool_size),
+)
+
+def on_starting(server):
+    # Schema setup once in the master, before any worker is forked
+    from app import init_db
+
+    init_db()
+
+
+def post_fork(server, worker):
+    # One UnleashClient (and its background poller thread) per worker;
+    # threads started in the master would not survive the fork.
+    from feature_flags import init_unleash
+
+    init_unleash()
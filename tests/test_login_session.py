@@ -0,0 +1,50 @@
+import fakeredis
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client(monkeypatch):
+    store = fakeredis.FakeStrictRedis()
+    monkeypatch.setattr(app_module.app.session_interface, "client", store)
+    monkeypatch.setattr(
+        app_module,
+        "query_one",
+        lambda sql, params=None: {"id": 7, "name": "Alice", "password_hash": "x"},
+    )
+    monkeypatch.setattr(app_module, "verify_password", lambda stored, password: (True, False))
+    app_module.app.config["TESTING"] = True
+    with app_module.app.test_client() as c:
+        c.store = store
+        yield c
+
+
+def _login(client):
+    resp = client.post("/login", data={"email": "alice@example.com", "password": "secret123"})
+    assert resp.status_code == 302
+    return client.get_cookie("session").value
+
+
+def test_login_rotates_existing_session_id(client):
+    with client.session_transaction() as sess:
+        sess["cart"] = [1]
+    before = client.get_cookie("session").value
+
+    after = _login(client)
+
+    assert after != before
+    assert client.store.get(f"session:{before}") is None
+    with client.session_transaction() as sess:
+        assert sess["user_id"] == 7
+        assert "cart" not in sess
+
+
+def test_login_rotates_planted_unknown_session_id(client):
+    client.set_cookie("session", "attacker-chosen-id")
+
+    after = _login(client)
+
+    assert after != "attacker-chosen-id"
+    with client.session_transaction() as sess:
+        assert sess["user_id"] == 7
@@ -0,0 +1,26 @@
+from argon2 import PasswordHasher
+from werkzeug.security import generate_password_hash
+
+from app import hash_password, verify_password
+
+
+def test_argon2_round_trip():
+    stored = hash_password("correct horse")
+    assert stored.startswith("$argon2id$")
+    assert verify_password(stored, "correct horse") == (True, False)
+    assert verify_password(stored, "wrong") == (False, False)
+
+
+def test_legacy_werkzeug_hash_needs_rehash():
+    stored = generate_password_hash("correct horse")
+    assert verify_password(stored, "correct horse") == (True, True)
+    assert verify_password(stored, "wrong")[0] is False
+
+
+def test_outdated_argon2_parameters_need_rehash():
+    stored = PasswordHasher(time_cost=1, memory_cost=8192, parallelism=1).hash("correct horse")
+    assert verify_password(stored, "correct horse") == (True, True)
+
+
+def test_malformed_argon2_hash_is_rejected():
+    assert verify_password("$argon2id$garbage", "correct horse") == (False, False)